@@ -54,7 +54,13 @@ func runPreCompactHook(projectDir string, opts ...hookOption) {
 	}
 
 	projectName := filepath.Base(projectDir)
-	files := readLines(filepath.Join(mark42Dir(projectDir), "dirty-files"))
+	m42 := mark42Dir(projectDir)
+	var stateFiles []string
+	if state := openHookState(m42, false); state != nil {
+		stateFiles = snapshotFiles(snapshotHookState(state, 0))
+		state.Close()
+	}
+	files := collectDirtyFiles(m42, stateFiles)
 
 	output := map[string]any{
 		"hookSpecificOutput": map[string]any{
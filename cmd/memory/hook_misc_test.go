@@ -55,6 +55,28 @@ func TestHookPreCompact(t *testing.T) {
 		}
 	})
 
+	t.Run("counts files tracked in state db", func(t *testing.T) {
+		dir := setupProjectDir(t)
+		for _, name := range []string{"a.go", "a.go", "b.go"} {
+			runPostToolUseHook(dir, hookInput{
+				ToolName:  "Edit",
+				ToolInput: toolInput{FilePath: filepath.Join(dir, name)},
+			})
+		}
+		os.WriteFile(filepath.Join(mark42Dir(dir), "dirty-files"), []byte(filepath.Join(dir, "b.go")+"\n"), 0o644)
+
+		var buf captureBuffer
+		runPreCompactHook(dir, withOutput(&buf))
+
+		var output map[string]any
+		json.Unmarshal([]byte(strings.TrimSpace(buf.String())), &output)
+		specific := output["hookSpecificOutput"].(map[string]any)
+
+		if specific["memoriesPreserved"] != float64(2) {
+			t.Errorf("memoriesPreserved = %v, want 2", specific["memoriesPreserved"])
+		}
+	})
+
 	t.Run("zero files produces zero count", func(t *testing.T) {
 		dir := setupProjectDir(t)
 
@@ -1,18 +1,37 @@
 package main
 
 import (
+	"bytes"
 	"encoding/json"
 	"os"
+	"os/exec"
 	"path/filepath"
 	"strings"
 	"time"
 
 	"github.com/spf13/cobra"
+
+	"github.com/mfenderov/mark42/internal/storage"
 )
 
 type hookInput struct {
-	ToolName  string         `json:"tool_name"`
-	ToolInput map[string]any `json:"tool_input"`
+	ToolName  string    `json:"tool_name"`
+	ToolInput toolInput `json:"tool_input"`
+}
+
+// toolInput holds only the tool_input fields the hook reads. Decoding into a
+// struct lets encoding/json skip large payloads such as Write's content or
+// Edit's old_string/new_string instead of materializing them in a map.
+type toolInput struct {
+	FilePath string `json:"file_path"`
+	Command  string `json:"command"`
+}
+
+// eventDetail is the tool-specific part of a recorded event, stored as JSON
+// in state.db; the tool name and time have columns of their own.
+type eventDetail struct {
+	FilePath string `json:"filePath,omitempty"`
+	Command  string `json:"command,omitempty"`
 }
 
 type pluginConfig struct {
@@ -42,16 +61,20 @@ func init() {
 	hookCmd.AddCommand(hookPostToolUseCmd)
 }
 
+// loadPluginConfig returns the trigger mode for projectDir. MARK42_TRIGGER_MODE
+// overrides the config file, skipping the read entirely; a missing file costs
+// a single failed open.
 func loadPluginConfig(projectDir string) pluginConfig {
+	if mode := os.Getenv("MARK42_TRIGGER_MODE"); mode != "" {
+		return pluginConfig{TriggerMode: mode}
+	}
+
+	cfg := pluginConfig{TriggerMode: "default"}
 	data, err := os.ReadFile(filepath.Join(mark42Dir(projectDir), "config.json"))
 	if err != nil {
-		return pluginConfig{TriggerMode: "default"}
-	}
-	var cfg pluginConfig
-	if err := json.Unmarshal(data, &cfg); err != nil {
-		return pluginConfig{TriggerMode: "default"}
+		return cfg
 	}
-	if cfg.TriggerMode == "" {
+	if json.Unmarshal(data, &cfg) != nil || cfg.TriggerMode == "" {
 		cfg.TriggerMode = "default"
 	}
 	return cfg
@@ -63,10 +86,8 @@ func runPostToolUseHook(projectDir string, input hookInput) {
 	command := ""
 	isGitCommit := false
 	if input.ToolName == "Bash" {
-		if cmd, ok := input.ToolInput["command"].(string); ok {
-			command = strings.TrimSpace(cmd)
-			isGitCommit = strings.Contains(command, "git commit")
-		}
+		command = strings.TrimSpace(input.ToolInput.Command)
+		isGitCommit = strings.Contains(command, "git commit")
 	}
 
 	if cfg.TriggerMode == "gitmode" && !isGitCommit {
@@ -74,20 +95,26 @@ func runPostToolUseHook(projectDir string, input hookInput) {
 	}
 
 	var filesToTrack []string
+	commitContext := ""
 
 	switch {
 	case isGitCommit:
-		// Git commit file extraction requires subprocess — skip for now,
-		// just track the event
+		hash, subject, files := lastCommitFiles(projectDir)
+		for _, f := range files {
+			filesToTrack = append(filesToTrack, resolvePath(f, projectDir))
+		}
+		if hash != "" {
+			commitContext = hash + ": " + subject
+		}
 	case input.ToolName == "Edit" || input.ToolName == "Write":
-		if fp, ok := input.ToolInput["file_path"].(string); ok && fp != "" {
-			filesToTrack = append(filesToTrack, fp)
+		if fp := input.ToolInput.FilePath; fp != "" {
+			filesToTrack = append(filesToTrack, resolvePath(fp, projectDir))
 		}
 	case input.ToolName == "Bash":
 		filesToTrack = extractFilesFromBash(command, projectDir)
 	default:
-		if fp, ok := input.ToolInput["file_path"].(string); ok && fp != "" {
-			filesToTrack = append(filesToTrack, fp)
+		if fp := input.ToolInput.FilePath; fp != "" {
+			filesToTrack = append(filesToTrack, resolvePath(fp, projectDir))
 		}
 	}
 
@@ -98,60 +125,78 @@ func runPostToolUseHook(projectDir string, input hookInput) {
 		}
 	}
 
-	m42 := mark42Dir(projectDir)
-	_ = os.MkdirAll(m42, 0o755)
-
-	// Always write session event (activity tracking for knowledge-only sessions)
-	event := map[string]string{
-		"toolName":  input.ToolName,
-		"timestamp": time.Now().UTC().Format(time.RFC3339),
-	}
+	// Always record the event (activity tracking for knowledge-only sessions).
+	// The event and its files go to state.db in one transaction; the files'
+	// primary key dedupes repeated edits as they are inserted.
+	var detail eventDetail
 	if (input.ToolName == "Edit" || input.ToolName == "Write") && len(trackable) > 0 {
-		event["filePath"] = trackable[0]
+		detail.FilePath = trackable[0]
 	} else if input.ToolName == "Bash" && command != "" {
 		cmd := command
 		if len(cmd) > 200 {
 			cmd = cmd[:200]
 		}
-		event["command"] = cmd
+		detail.Command = cmd
+	}
+	dirty := make([]storage.DirtyFile, 0, len(trackable))
+	for _, fp := range trackable {
+		dirty = append(dirty, storage.DirtyFile{Path: fp, Context: commitContext})
 	}
 
-	eventJSON, _ := json.Marshal(event)
-	eventsPath := filepath.Join(m42, "session-events")
-	f, err := os.OpenFile(eventsPath, os.O_APPEND|os.O_CREATE|os.O_WRONLY, 0o644)
-	if err == nil {
-		_, _ = f.Write(eventJSON)
-		_, _ = f.WriteString("\n")
-		f.Close()
+	// An Encoder rather than json.Marshal only for SetEscapeHTML(false), which
+	// keeps shell operators like && as two bytes instead of twelve. Its
+	// trailing newline is not part of the stored payload.
+	var buf bytes.Buffer
+	enc := json.NewEncoder(&buf)
+	enc.SetEscapeHTML(false)
+	if err := enc.Encode(detail); err != nil {
+		return
 	}
 
-	// Update dirty-files (only when files were modified)
-	if len(trackable) > 0 {
-		dirtyPath := filepath.Join(m42, "dirty-files")
-		existing := make(map[string]string)
-		for _, line := range readLines(dirtyPath) {
-			path := line
-			if idx := strings.Index(line, " ["); idx != -1 {
-				path = line[:idx]
-			}
-			existing[path] = line
-		}
+	state := openHookState(mark42Dir(projectDir), true)
+	if state == nil {
+		return
+	}
+	defer state.Close()
+	_ = state.Record(input.ToolName, strings.TrimSuffix(buf.String(), "\n"), time.Now().Unix(), dirty)
 
-		for _, fp := range trackable {
-			if _, ok := existing[fp]; !ok {
-				existing[fp] = fp
-			}
-		}
+	// CRITICAL: zero stdout output
+}
+
+// lastCommitFiles returns the short hash, subject and changed files of HEAD.
+// Hash, subject and file list come from a single git invocation; --relative
+// makes the paths relative to projectDir, so no separate repo-root lookup
+// is needed. -z keeps names verbatim: without it core.quotePath would quote
+// and octal-escape non-ASCII names, quotes and backslashes.
+func lastCommitFiles(projectDir string) (hash, subject string, files []string) {
+	out, err := exec.Command("git", "-C", projectDir, "log", "-1", "-z",
+		"--format=%h%x00%s", "--name-only", "--relative", "HEAD").Output()
+	if err != nil {
+		return "", "", nil
+	}
+
+	// Output is "hash\x00subject\x00\n" followed by NUL-terminated names.
+	parts := strings.SplitN(string(out), "\x00", 3)
+	if len(parts) < 3 {
+		return "", "", nil
+	}
 
-		var sb strings.Builder
-		for _, line := range existing {
-			sb.WriteString(line)
-			sb.WriteByte('\n')
+	for _, name := range strings.Split(strings.TrimPrefix(parts[2], "\n"), "\x00") {
+		if name != "" {
+			files = append(files, name)
 		}
-		_ = os.WriteFile(dirtyPath, []byte(sb.String()), 0o644)
 	}
+	return parts[0], parts[1], files
+}
 
-	// CRITICAL: zero stdout output
+// resolvePath turns p into an absolute, lexically cleaned path under base.
+// Symlinks are deliberately not evaluated: tracking only needs a stable key,
+// and filepath.EvalSymlinks costs an lstat per path component.
+func resolvePath(p, base string) string {
+	if !filepath.IsAbs(p) {
+		return filepath.Join(base, p)
+	}
+	return filepath.Clean(p)
 }
 
 func shouldTrack(filePath, projectDir string) bool {
@@ -160,12 +205,12 @@ func shouldTrack(filePath, projectDir string) bool {
 	}
 
 	rel, err := filepath.Rel(projectDir, filePath)
-	if err != nil {
+	if err != nil || rel == ".." || strings.HasPrefix(rel, ".."+string(filepath.Separator)) {
 		return false
 	}
 
 	parts := strings.SplitN(rel, string(filepath.Separator), 2)
-	if len(parts) > 0 && parts[0] == ".claude" {
+	if len(parts) > 0 && skipTopLevelDirs[parts[0]] {
 		return false
 	}
 
@@ -173,94 +218,93 @@ func shouldTrack(filePath, projectDir string) bool {
 		return false
 	}
 
+	if skipSuffixes[filepath.Ext(filePath)] {
+		return false
+	}
+
 	return true
 }
 
-func extractFilesFromBash(command, projectDir string) []string {
-	command = strings.TrimSpace(command)
-	if command == "" {
-		return nil
-	}
+// skipTopLevelDirs are project-root directories that hold tool state,
+// dependencies or build output rather than source worth remembering.
+var skipTopLevelDirs = map[string]bool{
+	".claude": true, ".git": true, "node_modules": true, ".venv": true,
+	"__pycache__": true, ".mypy_cache": true, ".pytest_cache": true,
+	"dist": true, "build": true, "target": true, ".next": true,
+}
 
-	skipPrefixes := []string{
-		"ls", "cat", "echo", "grep", "find", "head", "tail", "less", "more",
-		"cd", "pwd", "which", "whereis", "type", "file", "stat", "wc",
-		"git status", "git log", "git diff", "git show", "git branch",
-		"git fetch", "git pull", "git push", "git clone", "git checkout",
-		"git stash", "git remote", "git tag", "git rev-parse",
-		"npm ", "yarn ", "pnpm ", "node ", "python", "pip ", "uv ",
-		"cargo ", "go ", "make", "cmake", "docker ", "kubectl ",
-		"curl ", "wget ", "ssh ", "scp ", "rsync ",
-	}
-	for _, prefix := range skipPrefixes {
-		if strings.HasPrefix(command, prefix) {
+// skipSuffixes are generated file extensions that are never tracked.
+var skipSuffixes = map[string]bool{
+	".pyc": true, ".pyo": true, ".log": true,
+}
+
+// bashFileExtractors maps each file-mutating command to the function that
+// picks the affected paths out of its arguments. Every other command is
+// read-only for tracking purposes and returns before tokenizing.
+var bashFileExtractors = map[string]func(args []string) []string{
+	"rm":     func(args []string) []string { return pathArgs(args, 0) },
+	"git rm": func(args []string) []string { return pathArgs(args, 0) },
+	"mv": func(args []string) []string {
+		if len(args) < 2 {
 			return nil
 		}
-	}
+		return pathArgs(args, 1)
+	},
+	"git mv": func(args []string) []string { return pathArgs(args, 1) },
+	"unlink": func(args []string) []string { return pathArgs(args, 1) },
+}
 
-	tokens := shellTokenize(command)
-	if len(tokens) == 0 {
-		return nil
+// bashCommandKey returns the lookup key for bashFileExtractors: the first word,
+// or "git <subcommand>" for git.
+func bashCommandKey(command string) string {
+	first, rest, _ := strings.Cut(command, " ")
+	if first != "git" {
+		return first
 	}
+	sub, _, _ := strings.Cut(strings.TrimLeft(rest, " "), " ")
+	return "git " + sub
+}
 
+// pathArgs collects non-flag arguments up to the first shell operator or
+// redirect, stopping after limit paths when limit > 0.
+func pathArgs(args []string, limit int) []string {
 	var files []string
-	cmd := tokens[0]
-
-	switch {
-	case cmd == "rm":
-		for _, tok := range tokens[1:] {
-			if isShellSyntax(tok) {
-				break
-			}
-			if !strings.HasPrefix(tok, "-") {
-				files = append(files, tok)
-			}
+	for _, tok := range args {
+		if isShellSyntax(tok) {
+			break
 		}
-
-	case cmd == "git" && len(tokens) > 1 && tokens[1] == "rm":
-		for _, tok := range tokens[2:] {
-			if isShellSyntax(tok) {
-				break
-			}
-			if !strings.HasPrefix(tok, "-") {
-				files = append(files, tok)
-			}
+		if strings.HasPrefix(tok, "-") {
+			continue
 		}
-
-	case cmd == "mv" && len(tokens) >= 3:
-		for _, tok := range tokens[1:] {
-			if isShellSyntax(tok) {
-				break
-			}
-			if !strings.HasPrefix(tok, "-") {
-				files = append(files, tok)
-				break
-			}
+		files = append(files, tok)
+		if limit > 0 && len(files) == limit {
+			break
 		}
+	}
+	return files
+}
 
-	case cmd == "git" && len(tokens) > 2 && tokens[1] == "mv":
-		for _, tok := range tokens[2:] {
-			if isShellSyntax(tok) {
-				break
-			}
-			if !strings.HasPrefix(tok, "-") {
-				files = append(files, tok)
-				break
-			}
-		}
+func extractFilesFromBash(command, projectDir string) []string {
+	command = strings.TrimSpace(command)
+	if command == "" {
+		return nil
+	}
 
-	case cmd == "unlink" && len(tokens) > 1:
-		if !isShellSyntax(tokens[1]) {
-			files = append(files, tokens[1])
-		}
+	key := bashCommandKey(command)
+	extract, ok := bashFileExtractors[key]
+	if !ok {
+		return nil
+	}
+
+	tokens := shellTokenize(command)
+	skip := strings.Count(key, " ") + 1
+	if len(tokens) <= skip {
+		return nil
 	}
 
 	var resolved []string
-	for _, f := range files {
-		if !filepath.IsAbs(f) {
-			f = filepath.Join(projectDir, f)
-		}
-		resolved = append(resolved, filepath.Clean(f))
+	for _, f := range extract(tokens[skip:]) {
+		resolved = append(resolved, resolvePath(f, projectDir))
 	}
 	return resolved
 }
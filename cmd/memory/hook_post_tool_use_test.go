@@ -3,9 +3,12 @@ package main
 import (
 	"encoding/json"
 	"os"
+	"os/exec"
 	"path/filepath"
 	"strings"
 	"testing"
+
+	"github.com/mfenderov/mark42/internal/storage"
 )
 
 func TestShouldTrack(t *testing.T) {
@@ -20,6 +23,14 @@ func TestShouldTrack(t *testing.T) {
 		{"CLAUDE.md at root", "/proj/CLAUDE.md", "/proj", false},
 		{"CLAUDE.md nested", "/proj/sub/CLAUDE.md", "/proj", false},
 		{"outside project", "/other/file.go", "/proj", false},
+		{"sibling with shared prefix", "/proj2/file.go", "/proj", false},
+		{".git dir", "/proj/.git/index", "/proj", false},
+		{"node_modules", "/proj/node_modules/pkg/index.js", "/proj", false},
+		{"build output", "/proj/dist/app.js", "/proj", false},
+		{"nested build dir is source", "/proj/internal/build/build.go", "/proj", true},
+		{"dir name as prefix only", "/proj/distribution/notes.md", "/proj", true},
+		{"pyc file", "/proj/pkg/mod.pyc", "/proj", false},
+		{"log file", "/proj/server.log", "/proj", false},
 	}
 	for _, tt := range tests {
 		t.Run(tt.name, func(t *testing.T) {
@@ -31,6 +42,56 @@ func TestShouldTrack(t *testing.T) {
 	}
 }
 
+func TestLoadPluginConfig(t *testing.T) {
+	t.Run("defaults when config missing", func(t *testing.T) {
+		dir := setupProjectDir(t)
+		if got := loadPluginConfig(dir).TriggerMode; got != "default" {
+			t.Errorf("TriggerMode = %q, want default", got)
+		}
+	})
+
+	t.Run("reads trigger mode from config", func(t *testing.T) {
+		dir := setupProjectDir(t)
+		os.WriteFile(filepath.Join(mark42Dir(dir), "config.json"),
+			[]byte(`{"triggerMode":"gitmode"}`), 0o644)
+
+		if got := loadPluginConfig(dir).TriggerMode; got != "gitmode" {
+			t.Errorf("TriggerMode = %q, want gitmode", got)
+		}
+	})
+
+	t.Run("env var overrides config file", func(t *testing.T) {
+		dir := setupProjectDir(t)
+		os.WriteFile(filepath.Join(mark42Dir(dir), "config.json"),
+			[]byte(`{"triggerMode":"default"}`), 0o644)
+		t.Setenv("MARK42_TRIGGER_MODE", "gitmode")
+
+		if got := loadPluginConfig(dir).TriggerMode; got != "gitmode" {
+			t.Errorf("TriggerMode = %q, want gitmode", got)
+		}
+	})
+}
+
+func TestResolvePath(t *testing.T) {
+	tests := []struct {
+		name string
+		path string
+		want string
+	}{
+		{"relative", "src/main.go", "/proj/src/main.go"},
+		{"absolute", "/proj/src/main.go", "/proj/src/main.go"},
+		{"absolute uncleaned", "/proj/./src/../main.go", "/proj/main.go"},
+		{"relative parent", "../other/a.go", "/other/a.go"},
+	}
+	for _, tt := range tests {
+		t.Run(tt.name, func(t *testing.T) {
+			if got := resolvePath(tt.path, "/proj"); got != tt.want {
+				t.Errorf("resolvePath(%q) = %q, want %q", tt.path, got, tt.want)
+			}
+		})
+	}
+}
+
 func TestShellTokenize(t *testing.T) {
 	tests := []struct {
 		name  string
@@ -109,6 +170,15 @@ func TestExtractFilesFromBash(t *testing.T) {
 		{"skip git status", "git status", nil},
 		{"skip go build", "go build ./...", nil},
 		{"skip make", "make test", nil},
+		{"skip python3", "python3 script.py", nil},
+		{"skip rmdir", "rmdir build", nil},
+		{"skip pipx", "pipx install ruff", nil},
+		{"skip git rm prefix lookalike", "git rmx old.go", nil},
+		{"skip rm as later word", "echo rm old.go", nil},
+		{"skip bare rm", "rm", nil},
+		{"mv needs destination", "mv old.go", nil},
+		{"git rm extra spaces", "git  rm old.go", []string{"/proj/old.go"}},
+		{"git rm with flags", "git rm --cached a.go b.go", []string{"/proj/a.go", "/proj/b.go"}},
 		{"empty", "", nil},
 		{"rm stops at pipe", "rm foo.go | echo done", []string{"/proj/foo.go"}},
 		{"rm stops at &&", "rm foo.go && echo done", []string{"/proj/foo.go"}},
@@ -129,17 +199,78 @@ func TestExtractFilesFromBash(t *testing.T) {
 	}
 }
 
+func TestLastCommitFiles(t *testing.T) {
+	t.Run("returns hash subject and files of HEAD", func(t *testing.T) {
+		dir := setupGitRepo(t)
+		gitCommitFile(t, dir, "src/main.go", "Add main")
+
+		hash, subject, files := lastCommitFiles(dir)
+		if hash == "" {
+			t.Error("expected commit hash")
+		}
+		if subject != "Add main" {
+			t.Errorf("subject = %q, want %q", subject, "Add main")
+		}
+		if len(files) != 1 || files[0] != "src/main.go" {
+			t.Errorf("files = %v, want [src/main.go]", files)
+		}
+	})
+
+	t.Run("keeps non-ASCII and quoted names verbatim", func(t *testing.T) {
+		dir := setupGitRepo(t)
+
+		for _, name := range []string{"src/café.go", `we"ird\name.go`} {
+			gitCommitFile(t, dir, name, "Add "+name)
+			if _, _, files := lastCommitFiles(dir); len(files) != 1 || files[0] != name {
+				t.Errorf("files = %q, want [%q]", files, name)
+			}
+		}
+	})
+
+	t.Run("returns nothing outside a git repo", func(t *testing.T) {
+		hash, _, files := lastCommitFiles(t.TempDir())
+		if hash != "" || len(files) != 0 {
+			t.Errorf("expected empty result, got hash=%q files=%v", hash, files)
+		}
+	})
+}
+
+func TestHookInputDecode(t *testing.T) {
+	raw := `{"tool_name":"Write","tool_input":{"file_path":"/proj/a.go","content":"package main\n"}}`
+
+	var input hookInput
+	if err := json.Unmarshal([]byte(raw), &input); err != nil {
+		t.Fatalf("decode failed: %v", err)
+	}
+	if input.ToolName != "Write" || input.ToolInput.FilePath != "/proj/a.go" {
+		t.Errorf("got %+v", input)
+	}
+}
+
+func BenchmarkExtractFilesFromBash(b *testing.B) {
+	commands := []string{
+		"go test ./...",
+		"git status",
+		"npm install",
+		"rm -rf build/tmp.go",
+		"git mv old.go new.go",
+	}
+	for i := 0; i < b.N; i++ {
+		extractFilesFromBash(commands[i%len(commands)], "/proj")
+	}
+}
+
 func TestPostToolUseHook(t *testing.T) {
 	t.Run("tracks Edit file", func(t *testing.T) {
 		dir := setupProjectDir(t)
 
 		input := hookInput{
 			ToolName:  "Edit",
-			ToolInput: map[string]any{"file_path": filepath.Join(dir, "src", "main.go")},
+			ToolInput: toolInput{FilePath: filepath.Join(dir, "src", "main.go")},
 		}
 		runPostToolUseHook(dir, input)
 
-		dirty := readLines(filepath.Join(mark42Dir(dir), "dirty-files"))
+		dirty := trackedFiles(dir)
 		if len(dirty) != 1 {
 			t.Fatalf("got %d dirty files, want 1", len(dirty))
 		}
@@ -147,7 +278,7 @@ func TestPostToolUseHook(t *testing.T) {
 			t.Errorf("dirty file should contain main.go, got %q", dirty[0])
 		}
 
-		events := readLines(filepath.Join(mark42Dir(dir), "session-events"))
+		events := recordedEvents(t, dir)
 		if len(events) != 1 {
 			t.Fatalf("got %d events, want 1", len(events))
 		}
@@ -158,11 +289,11 @@ func TestPostToolUseHook(t *testing.T) {
 
 		input := hookInput{
 			ToolName:  "Write",
-			ToolInput: map[string]any{"file_path": filepath.Join(dir, "new.go")},
+			ToolInput: toolInput{FilePath: filepath.Join(dir, "new.go")},
 		}
 		runPostToolUseHook(dir, input)
 
-		dirty := readLines(filepath.Join(mark42Dir(dir), "dirty-files"))
+		dirty := trackedFiles(dir)
 		if len(dirty) != 1 {
 			t.Fatalf("got %d dirty files, want 1", len(dirty))
 		}
@@ -173,11 +304,11 @@ func TestPostToolUseHook(t *testing.T) {
 
 		input := hookInput{
 			ToolName:  "Edit",
-			ToolInput: map[string]any{"file_path": filepath.Join(dir, ".claude", "config.json")},
+			ToolInput: toolInput{FilePath: filepath.Join(dir, ".claude", "config.json")},
 		}
 		runPostToolUseHook(dir, input)
 
-		dirty := readLines(filepath.Join(mark42Dir(dir), "dirty-files"))
+		dirty := trackedFiles(dir)
 		if len(dirty) != 0 {
 			t.Errorf("should not track .claude files, got %d", len(dirty))
 		}
@@ -188,11 +319,11 @@ func TestPostToolUseHook(t *testing.T) {
 
 		input := hookInput{
 			ToolName:  "Edit",
-			ToolInput: map[string]any{"file_path": filepath.Join(dir, "CLAUDE.md")},
+			ToolInput: toolInput{FilePath: filepath.Join(dir, "CLAUDE.md")},
 		}
 		runPostToolUseHook(dir, input)
 
-		dirty := readLines(filepath.Join(mark42Dir(dir), "dirty-files"))
+		dirty := trackedFiles(dir)
 		if len(dirty) != 0 {
 			t.Errorf("should not track CLAUDE.md, got %d", len(dirty))
 		}
@@ -204,34 +335,85 @@ func TestPostToolUseHook(t *testing.T) {
 
 		input := hookInput{
 			ToolName:  "Edit",
-			ToolInput: map[string]any{"file_path": filePath},
+			ToolInput: toolInput{FilePath: filePath},
 		}
 		runPostToolUseHook(dir, input)
 		runPostToolUseHook(dir, input)
 
-		dirty := readLines(filepath.Join(mark42Dir(dir), "dirty-files"))
+		dirty := trackedFiles(dir)
 		if len(dirty) != 1 {
 			t.Errorf("should deduplicate, got %d dirty files", len(dirty))
 		}
 	})
 
-	t.Run("writes session events as JSONL", func(t *testing.T) {
+	t.Run("normalizes Edit paths for dedup", func(t *testing.T) {
+		dir := setupProjectDir(t)
+
+		runPostToolUseHook(dir, hookInput{
+			ToolName:  "Edit",
+			ToolInput: toolInput{FilePath: filepath.Join(dir, "src", "main.go")},
+		})
+		runPostToolUseHook(dir, hookInput{
+			ToolName:  "Edit",
+			ToolInput: toolInput{FilePath: dir + "/src/./main.go"},
+		})
+
+		if got := trackedFiles(dir); len(got) != 1 {
+			t.Errorf("equivalent paths should dedupe, got %v", got)
+		}
+	})
+
+	t.Run("records session events in state db", func(t *testing.T) {
 		dir := setupProjectDir(t)
 
 		input := hookInput{
 			ToolName:  "Edit",
-			ToolInput: map[string]any{"file_path": filepath.Join(dir, "a.go")},
+			ToolInput: toolInput{FilePath: filepath.Join(dir, "a.go")},
 		}
 		runPostToolUseHook(dir, input)
 
-		eventPath := filepath.Join(mark42Dir(dir), "session-events")
-		data, _ := os.ReadFile(eventPath)
-		var evt map[string]any
-		if err := json.Unmarshal([]byte(strings.TrimSpace(string(data))), &evt); err != nil {
-			t.Fatalf("event not valid JSON: %v", err)
+		events := recordedEvents(t, dir)
+		if len(events) != 1 {
+			t.Fatalf("got %d events, want 1", len(events))
+		}
+		if events[0].Tool != "Edit" || events[0].TS == 0 {
+			t.Errorf("event = %+v, want Edit with Unix seconds", events[0])
+		}
+		if want := `{"filePath":"` + filepath.Join(dir, "a.go") + `"}`; events[0].Data != want {
+			t.Errorf("event data = %s, want %s", events[0].Data, want)
 		}
-		if evt["toolName"] != "Edit" {
-			t.Errorf("event toolName = %v, want Edit", evt["toolName"])
+		if got := trackedFiles(dir); len(got) != 1 || got[0] != filepath.Join(dir, "a.go") {
+			t.Errorf("tracked files = %v, want [%s]", got, filepath.Join(dir, "a.go"))
+		}
+	})
+
+	t.Run("does not write the text buffers", func(t *testing.T) {
+		dir := setupProjectDir(t)
+
+		input := hookInput{
+			ToolName:  "Write",
+			ToolInput: toolInput{FilePath: filepath.Join(dir, "a.go")},
+		}
+		runPostToolUseHook(dir, input)
+
+		for _, name := range []string{"dirty-files", "session-events"} {
+			if _, err := os.Stat(filepath.Join(mark42Dir(dir), name)); !os.IsNotExist(err) {
+				t.Errorf("%s should not be written by the hook", name)
+			}
+		}
+	})
+
+	t.Run("creates mark42 dir on first event", func(t *testing.T) {
+		dir := t.TempDir()
+
+		input := hookInput{
+			ToolName:  "Edit",
+			ToolInput: toolInput{FilePath: filepath.Join(dir, "a.go")},
+		}
+		runPostToolUseHook(dir, input)
+
+		if got := trackedFiles(dir); len(got) != 1 {
+			t.Errorf("got %d tracked files, want 1", len(got))
 		}
 	})
 
@@ -243,11 +425,11 @@ func TestPostToolUseHook(t *testing.T) {
 
 		input := hookInput{
 			ToolName:  "Edit",
-			ToolInput: map[string]any{"file_path": filepath.Join(dir, "a.go")},
+			ToolInput: toolInput{FilePath: filepath.Join(dir, "a.go")},
 		}
 		runPostToolUseHook(dir, input)
 
-		dirty := readLines(filepath.Join(configDir, "dirty-files"))
+		dirty := trackedFiles(dir)
 		if len(dirty) != 0 {
 			t.Errorf("gitmode should skip non-commit, got %d", len(dirty))
 		}
@@ -258,68 +440,167 @@ func TestPostToolUseHook(t *testing.T) {
 
 		input := hookInput{
 			ToolName:  "Bash",
-			ToolInput: map[string]any{"command": "go test ./..."},
+			ToolInput: toolInput{Command: "go test ./..."},
 		}
 		runPostToolUseHook(dir, input)
 
-		dirty := readLines(filepath.Join(mark42Dir(dir), "dirty-files"))
+		dirty := trackedFiles(dir)
 		if len(dirty) != 0 {
 			t.Errorf("read-only Bash should not create dirty files, got %d", len(dirty))
 		}
 
-		events := readLines(filepath.Join(mark42Dir(dir), "session-events"))
+		events := recordedEvents(t, dir)
 		if len(events) != 1 {
 			t.Fatalf("read-only Bash should still write event, got %d events", len(events))
 		}
 
 		var evt map[string]any
-		if err := json.Unmarshal([]byte(events[0]), &evt); err != nil {
-			t.Fatalf("event not valid JSON: %v", err)
+		if err := json.Unmarshal([]byte(events[0].Data), &evt); err != nil {
+			t.Fatalf("event data not valid JSON: %v", err)
 		}
-		if evt["toolName"] != "Bash" {
-			t.Errorf("event toolName = %v, want Bash", evt["toolName"])
+		if events[0].Tool != "Bash" {
+			t.Errorf("event tool = %v, want Bash", events[0].Tool)
 		}
 		if evt["command"] != "go test ./..." {
 			t.Errorf("event command = %v, want 'go test ./...'", evt["command"])
 		}
 	})
 
+	t.Run("Bash event keeps shell operators unescaped", func(t *testing.T) {
+		dir := setupProjectDir(t)
+
+		input := hookInput{
+			ToolName:  "Bash",
+			ToolInput: toolInput{Command: "go build ./... && go test ./..."},
+		}
+		runPostToolUseHook(dir, input)
+
+		events := recordedEvents(t, dir)
+		if len(events) != 1 {
+			t.Fatalf("got %d events, want 1", len(events))
+		}
+		if want := `{"command":"go build ./... && go test ./..."}`; events[0].Data != want {
+			t.Errorf("event data = %q, want %q", events[0].Data, want)
+		}
+	})
+
 	t.Run("excluded Edit writes event but no dirty files", func(t *testing.T) {
 		dir := setupProjectDir(t)
 
 		input := hookInput{
 			ToolName:  "Edit",
-			ToolInput: map[string]any{"file_path": filepath.Join(dir, ".claude", "config.json")},
+			ToolInput: toolInput{FilePath: filepath.Join(dir, ".claude", "config.json")},
 		}
 		runPostToolUseHook(dir, input)
 
-		dirty := readLines(filepath.Join(mark42Dir(dir), "dirty-files"))
+		dirty := trackedFiles(dir)
 		if len(dirty) != 0 {
 			t.Errorf("excluded file should not create dirty files, got %d", len(dirty))
 		}
 
-		events := readLines(filepath.Join(mark42Dir(dir), "session-events"))
+		events := recordedEvents(t, dir)
 		if len(events) != 1 {
 			t.Fatalf("excluded Edit should still write event, got %d events", len(events))
 		}
 	})
 
+	t.Run("git commit tracks committed files with context", func(t *testing.T) {
+		dir := setupGitRepo(t)
+		gitCommitFile(t, dir, "lib.go", "Add lib")
+
+		input := hookInput{
+			ToolName:  "Bash",
+			ToolInput: toolInput{Command: `git commit -m "Add lib"`},
+		}
+		runPostToolUseHook(dir, input)
+
+		dirty := trackedFiles(dir)
+		if len(dirty) != 1 {
+			t.Fatalf("got %d dirty files, want 1", len(dirty))
+		}
+		if !strings.HasPrefix(dirty[0], filepath.Join(dir, "lib.go")+" [") {
+			t.Errorf("dirty line should carry commit context, got %q", dirty[0])
+		}
+		if !strings.HasSuffix(dirty[0], ": Add lib]") {
+			t.Errorf("dirty line should end with commit subject, got %q", dirty[0])
+		}
+	})
+
 	t.Run("Bash rm extracts file", func(t *testing.T) {
 		dir := setupProjectDir(t)
 
 		input := hookInput{
 			ToolName:  "Bash",
-			ToolInput: map[string]any{"command": "rm " + filepath.Join(dir, "old.go")},
+			ToolInput: toolInput{Command: "rm " + filepath.Join(dir, "old.go")},
 		}
 		runPostToolUseHook(dir, input)
 
-		dirty := readLines(filepath.Join(mark42Dir(dir), "dirty-files"))
+		dirty := trackedFiles(dir)
 		if len(dirty) != 1 {
 			t.Fatalf("got %d dirty files, want 1", len(dirty))
 		}
 	})
 }
 
+func trackedFiles(dir string) []string {
+	m42 := mark42Dir(dir)
+	state := openHookState(m42, false)
+	if state != nil {
+		defer state.Close()
+	}
+	return collectDirtyFiles(m42, snapshotFiles(snapshotHookState(state, 0)))
+}
+
+// recordedEvents returns the events the hook stored in state.db.
+func recordedEvents(t *testing.T, dir string) []storage.HookEvent {
+	t.Helper()
+	state := openHookState(mark42Dir(dir), false)
+	if state == nil {
+		return nil
+	}
+	defer state.Close()
+	snap, err := state.Snapshot(100)
+	if err != nil {
+		t.Fatal(err)
+	}
+	return snap.Events
+}
+
+func setupGitRepo(t *testing.T) string {
+	t.Helper()
+	if _, err := exec.LookPath("git"); err != nil {
+		t.Skip("git not available")
+	}
+	dir := setupProjectDir(t)
+	for _, args := range [][]string{
+		{"init", "-q"},
+		{"config", "user.email", "test@example.com"},
+		{"config", "user.name", "Test"},
+		// Keep a developer's global commit.gpgsign from prompting or failing.
+		{"config", "commit.gpgsign", "false"},
+	} {
+		if out, err := exec.Command("git", append([]string{"-C", dir}, args...)...).CombinedOutput(); err != nil {
+			t.Fatalf("git %v: %v\n%s", args, err, out)
+		}
+	}
+	return dir
+}
+
+func gitCommitFile(t *testing.T, dir, rel, message string) {
+	t.Helper()
+	path := filepath.Join(dir, rel)
+	os.MkdirAll(filepath.Dir(path), 0o755)
+	os.WriteFile(path, []byte(message+"\n"), 0o644)
+	for _, args := range [][]string{
+		{"add", rel},
+		{"commit", "-q", "-m", message},
+	} {
+		if out, err := exec.Command("git", append([]string{"-C", dir}, args...)...).CombinedOutput(); err != nil {
+			t.Fatalf("git %v: %v\n%s", args, err, out)
+		}
+	}
+}
+
 func setupProjectDir(t *testing.T) string {
 	t.Helper()
 	dir := t.TempDir()
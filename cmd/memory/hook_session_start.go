@@ -52,6 +52,16 @@ var hookSessionStartCmd = &cobra.Command{
 			return nil
 		}
 
+		if !daemonDisabled() {
+			socketPath := defaultSocketPath()
+			if runSessionStartFromDaemon(projectDir, socketPath) {
+				return nil
+			}
+			// Runs after the store below is closed, so the worker's own
+			// migration never overlaps with this process.
+			defer startDaemon(socketPath)
+		}
+
 		store, err := getStore()
 		if err != nil {
 			return nil
@@ -80,16 +90,65 @@ func runSessionStartHook(projectDir string, store *storage.Store, opts ...hookOp
 		return
 	}
 
-	projectName := filepath.Base(projectDir)
+	printSessionBootstrap(cfg, buildSessionBootstrap(store, filepath.Base(projectDir)))
+}
+
+// runSessionStartFromDaemon answers the hook from a running `mark42 serve`
+// worker. It returns false when no worker replied, so the caller can fall
+// back to opening the store in-process.
+func runSessionStartFromDaemon(projectDir, socketPath string, opts ...hookOption) bool {
+	resp, err := daemonCall(socketPath, daemonRequest{Command: "bootstrap", Project: filepath.Base(projectDir)})
+	if err != nil || resp.Bootstrap == nil {
+		return false
+	}
+
+	cfg := &hookConfig{}
+	for _, o := range opts {
+		o(cfg)
+	}
+
+	clearFlag(filepath.Join(mark42Dir(projectDir), "stop-prompted"))
+	printSessionBootstrap(cfg, *resp.Bootstrap)
+	return true
+}
+
+func printSessionBootstrap(cfg *hookConfig, b sessionBootstrap) {
+	if b.Recall == "" && b.Context == "" {
+		return
+	}
+
+	hookPrintf(cfg, "=== mark42: %s ===\n", b.Project)
+	hookPrintf(cfg, "[%d estimated tokens]\n\n", b.EstimatedTokens)
+	hookPrint(cfg, b.combined())
+}
+
+// sessionBootstrap is everything injected at session start, gathered with a
+// single store open.
+type sessionBootstrap struct {
+	Project         string `json:"project"`
+	Recall          string `json:"recall,omitempty"`
+	Context         string `json:"context,omitempty"`
+	EstimatedTokens int    `json:"estimatedTokens"`
+}
+
+func (b sessionBootstrap) combined() string {
 	var parts []string
+	if b.Recall != "" {
+		parts = append(parts, b.Recall)
+	}
+	if b.Context != "" {
+		parts = append(parts, b.Context)
+	}
+	return strings.Join(parts, "\n\n")
+}
+
+func buildSessionBootstrap(store *storage.Store, projectName string) sessionBootstrap {
+	b := sessionBootstrap{Project: projectName}
 
 	// Session recall
 	results, err := store.GetRecentSessionSummaries(projectName, 72, 500)
 	if err == nil && len(results) > 0 {
-		formatted := storage.FormatSessionRecall(results)
-		if formatted != "" {
-			parts = append(parts, strings.TrimSpace(formatted))
-		}
+		b.Recall = strings.TrimSpace(storage.FormatSessionRecall(results))
 	}
 
 	// Knowledge graph context
@@ -97,20 +156,9 @@ func runSessionStartHook(projectDir string, store *storage.Store, opts ...hookOp
 	ctxCfg.TokenBudget = 1500
 	ctxResults, err := store.GetContextForInjection(ctxCfg, projectName)
 	if err == nil && len(ctxResults) > 0 {
-		formatted := storage.FormatContextResults(ctxResults)
-		if formatted != "" {
-			parts = append(parts, strings.TrimSpace(formatted))
-		}
+		b.Context = strings.TrimSpace(storage.FormatContextResults(ctxResults))
 	}
 
-	if len(parts) == 0 {
-		return
-	}
-
-	combined := strings.Join(parts, "\n\n")
-	estimatedTokens := storage.EstimateTokens(combined)
-
-	hookPrintf(cfg, "=== mark42: %s ===\n", projectName)
-	hookPrintf(cfg, "[%d estimated tokens]\n\n", estimatedTokens)
-	hookPrint(cfg, combined)
+	b.EstimatedTokens = storage.EstimateTokens(b.combined())
+	return b
 }
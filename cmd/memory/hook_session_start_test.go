@@ -85,6 +85,49 @@ func TestHookSessionStart(t *testing.T) {
 	})
 }
 
+func TestBuildSessionBootstrap(t *testing.T) {
+	t.Run("collects recall and context sections", func(t *testing.T) {
+		store, err := storage.NewStore(filepath.Join(t.TempDir(), "test.db"))
+		if err != nil {
+			t.Fatal(err)
+		}
+		defer store.Close()
+		store.Migrate()
+
+		session, _ := store.CreateSession("testproject")
+		store.CompleteSession(session.Name, "Did some testing work")
+		store.CreateEntity("Go Conventions", "convention", []string{"Use gofmt"})
+
+		b := buildSessionBootstrap(store, "testproject")
+		if b.Project != "testproject" {
+			t.Errorf("Project = %q, want testproject", b.Project)
+		}
+		if !contains(b.Recall, "Recent Sessions") {
+			t.Errorf("Recall missing session header, got: %s", b.Recall)
+		}
+		if !contains(b.Context, "Relevant Memories") {
+			t.Errorf("Context missing memories header, got: %s", b.Context)
+		}
+		if b.EstimatedTokens == 0 {
+			t.Error("EstimatedTokens should be set")
+		}
+	})
+
+	t.Run("empty store yields empty sections", func(t *testing.T) {
+		store, err := storage.NewStore(filepath.Join(t.TempDir(), "test.db"))
+		if err != nil {
+			t.Fatal(err)
+		}
+		defer store.Close()
+		store.Migrate()
+
+		b := buildSessionBootstrap(store, "empty")
+		if b.Recall != "" || b.Context != "" {
+			t.Errorf("expected empty sections, got %+v", b)
+		}
+	})
+}
+
 func contains(s, substr string) bool {
 	return len(s) >= len(substr) && (s == substr || s != "" && containsStr(s, substr))
 }
@@ -7,6 +7,7 @@ import (
 	"os"
 	"path/filepath"
 	"strings"
+	"time"
 
 	"github.com/spf13/cobra"
 
@@ -65,20 +66,17 @@ func runStopHook(projectDir string, opts ...hookOption) {
 
 	projectName := filepath.Base(projectDir)
 
-	// Read session events
-	type eventEntry struct {
-		ToolName  string `json:"toolName"`
-		FilePath  string `json:"filePath,omitempty"`
-		Command   string `json:"command,omitempty"`
-		Timestamp string `json:"timestamp,omitempty"`
-	}
-	events := readJSONLines[eventEntry](filepath.Join(m42, "session-events"))
-	if len(events) > 50 {
-		events = events[:50]
+	// Read up to 50 session events. A session-events log left by an older
+	// build is drained first, as its events predate anything in state.db.
+	state := openHookState(m42, false)
+	if state != nil {
+		defer state.Close()
 	}
-
-	// Read dirty files
-	files := readLines(filepath.Join(m42, "dirty-files"))
+	events := readSessionEvents(filepath.Join(m42, "session-events"), 50)
+	snap := snapshotHookState(state, 50-len(events))
+	events = append(events, snapshotEvents(snap)...)
+	files := collectDirtyFiles(m42, snapshotFiles(snap))
+	formatEventTimestamps(events)
 
 	// Build and write session digest from transcript
 	var lastMsg string
@@ -95,7 +93,11 @@ func runStopHook(projectDir string, opts ...hookOption) {
 	// Capture session directly in SQLite (silent, no blocking)
 	captureSessionDirectly(projectName, events, files, lastMsg)
 
-	// Clear both buffers (deterministic cleanup — don't rely on agent)
+	// Clear all buffers (deterministic cleanup — don't rely on agent). Only
+	// the snapshot is released: hooks that ran since it was read keep theirs.
+	if snap != nil {
+		_ = state.Release(snap)
+	}
 	clearFile(filepath.Join(m42, "session-events"))
 	clearFile(filepath.Join(m42, "dirty-files"))
 
@@ -115,6 +117,16 @@ func runStopHook(projectDir string, opts ...hookOption) {
 	hookPrint(cfg, string(data))
 }
 
+// formatEventTimestamps fills Timestamp from the Unix TS recorded by the
+// post-tool-use hook, so formatting happens once here instead of per tool call.
+func formatEventTimestamps(events []sessionEvent) {
+	for i := range events {
+		if events[i].Timestamp == "" && events[i].TS != 0 {
+			events[i].Timestamp = time.Unix(events[i].TS, 0).UTC().Format(time.RFC3339)
+		}
+	}
+}
+
 const (
 	maxMessageLen = 500
 	maxDigestSize = 30 * 1024
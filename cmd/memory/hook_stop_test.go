@@ -249,6 +249,26 @@ func TestBuildAutoSummaryWithContext(t *testing.T) {
 	})
 }
 
+func TestFormatEventTimestamps(t *testing.T) {
+	events := []sessionEvent{
+		{ToolName: "Edit", TS: 1700000000},
+		{ToolName: "Bash", Timestamp: "2024-01-01T00:00:00Z"},
+		{ToolName: "Write"},
+	}
+
+	formatEventTimestamps(events)
+
+	if events[0].Timestamp != "2023-11-14T22:13:20Z" {
+		t.Errorf("events[0].Timestamp = %q, want 2023-11-14T22:13:20Z", events[0].Timestamp)
+	}
+	if events[1].Timestamp != "2024-01-01T00:00:00Z" {
+		t.Errorf("existing timestamp should be kept, got %q", events[1].Timestamp)
+	}
+	if events[2].Timestamp != "" {
+		t.Errorf("event without ts should stay empty, got %q", events[2].Timestamp)
+	}
+}
+
 func TestHookStop(t *testing.T) {
 	t.Run("full mode systemMessage when files edited", func(t *testing.T) {
 		dir := setupProjectDir(t)
@@ -374,6 +394,30 @@ func TestHookStop(t *testing.T) {
 		}
 	})
 
+	t.Run("captures and clears state db", func(t *testing.T) {
+		dir := setupProjectDir(t)
+		m42 := mark42Dir(dir)
+
+		runPostToolUseHook(dir, hookInput{
+			ToolName:  "Edit",
+			ToolInput: toolInput{FilePath: filepath.Join(dir, "a.go")},
+		})
+		os.WriteFile(filepath.Join(m42, "session-events"), []byte(`{"toolName":"Read"}`+"\n"), 0o644)
+
+		var buf captureBuffer
+		runStopHook(dir, withOutput(&buf))
+
+		if !strings.Contains(buf.String(), "2 events, full mode") {
+			t.Errorf("expected legacy and state.db events in full mode, got: %s", buf.String())
+		}
+		if got := recordedEvents(t, dir); len(got) != 0 {
+			t.Errorf("state.db events should be cleared, got %d", len(got))
+		}
+		if got := trackedFiles(dir); len(got) != 0 {
+			t.Errorf("state.db dirty files should be cleared, got %v", got)
+		}
+	})
+
 	t.Run("no output without project dir", func(t *testing.T) {
 		var buf captureBuffer
 		runStopHook("", withOutput(&buf))
@@ -1,12 +1,16 @@
 package main
 
 import (
+	"bufio"
+	"bytes"
 	"encoding/json"
 	"os"
 	"path/filepath"
 	"strings"
 
 	"github.com/spf13/cobra"
+
+	"github.com/mfenderov/mark42/internal/storage"
 )
 
 var hookCmd = &cobra.Command{
@@ -31,12 +35,26 @@ func readStdinJSON(v any) error {
 	return json.NewDecoder(os.Stdin).Decode(v)
 }
 
-func readLines(path string) []string {
+// readFileData reads path in one call. Missing and empty files — the common
+// case for the hook buffers — cost a single stat.
+func readFileData(path string) []byte {
+	if st, err := os.Stat(path); err != nil || st.Size() == 0 {
+		return nil
+	}
 	data, err := os.ReadFile(path)
 	if err != nil {
 		return nil
 	}
-	var lines []string
+	return data
+}
+
+// readLines returns the non-blank, trimmed lines of path.
+func readLines(path string) []string {
+	data := readFileData(path)
+	if data == nil {
+		return nil
+	}
+	lines := make([]string, 0, bytes.Count(data, []byte{'\n'})+1)
 	for _, line := range strings.Split(string(data), "\n") {
 		line = strings.TrimSpace(line)
 		if line != "" {
@@ -46,29 +64,164 @@ func readLines(path string) []string {
 	return lines
 }
 
-func readJSONLines[T any](path string) []T {
-	lines := readLines(path)
-	var results []T
+// dirtyFilePath strips the optional " [hash: msg]" context from a dirty-files line.
+func dirtyFilePath(line string) string {
+	if idx := strings.Index(line, " ["); idx != -1 {
+		return line[:idx]
+	}
+	return line
+}
+
+// sessionEvent is one recorded tool call, either from state.db or from a
+// session-events log left by an older build. TS is the Unix time state.db
+// stores; Timestamp (RFC 3339) is filled in from it when events are handed
+// to storage, and is what the older log carried.
+type sessionEvent struct {
+	ToolName  string `json:"toolName"`
+	FilePath  string `json:"filePath,omitempty"`
+	Command   string `json:"command,omitempty"`
+	TS        int64  `json:"-"`
+	Timestamp string `json:"timestamp,omitempty"`
+}
+
+// dedupDirtyFiles deduplicates dirty-files entries by path, keeping first-seen
+// order. An entry carrying commit context replaces an earlier plain entry.
+func dedupDirtyFiles(lines []string) []string {
+	index := make(map[string]int, len(lines))
+	var files []string
 	for _, line := range lines {
-		var v T
-		if err := json.Unmarshal([]byte(line), &v); err == nil {
-			results = append(results, v)
+		key := dirtyFilePath(line)
+		i, seen := index[key]
+		switch {
+		case !seen:
+			index[key] = len(files)
+			files = append(files, line)
+		case line != key:
+			files[i] = line
+		}
+	}
+	return files
+}
+
+// collectDirtyFiles merges the files tracked in state.db with any lines in
+// dirty-files, which /mark42:sync (and older builds) append to directly.
+func collectDirtyFiles(m42 string, stateFiles []string) []string {
+	lines := append(stateFiles, readLines(filepath.Join(m42, "dirty-files"))...)
+	return dedupDirtyFiles(lines)
+}
+
+// openHookState opens state.db under m42. Unless create is set, a missing
+// database returns nil after a single stat, so readers never create one.
+func openHookState(m42 string, create bool) *storage.HookState {
+	path := filepath.Join(m42, "state.db")
+	if create {
+		if err := os.MkdirAll(m42, 0o755); err != nil {
+			return nil
+		}
+	} else if _, err := os.Stat(path); err != nil {
+		return nil
+	}
+	state, err := storage.OpenHookState(path)
+	if err != nil {
+		return nil
+	}
+	return state
+}
+
+// snapshotHookState reads up to limit events and every dirty file from state.
+// A nil state, or a failed read, yields a nil snapshot.
+func snapshotHookState(state *storage.HookState, limit int) *storage.HookSnapshot {
+	if state == nil {
+		return nil
+	}
+	snap, err := state.Snapshot(limit)
+	if err != nil {
+		return nil
+	}
+	return snap
+}
+
+// snapshotEvents decodes the events in snap; the tool name and time come
+// from their own columns, the remaining fields from the JSON payload.
+func snapshotEvents(snap *storage.HookSnapshot) []sessionEvent {
+	if snap == nil {
+		return nil
+	}
+	events := make([]sessionEvent, 0, len(snap.Events))
+	for _, e := range snap.Events {
+		evt := sessionEvent{ToolName: e.Tool, TS: e.TS}
+		if json.Unmarshal([]byte(e.Data), &evt) == nil {
+			events = append(events, evt)
+		}
+	}
+	return events
+}
+
+// snapshotFiles formats the dirty files in snap as dirty-files lines.
+func snapshotFiles(snap *storage.HookSnapshot) []string {
+	if snap == nil {
+		return nil
+	}
+	files := make([]string, 0, len(snap.Files))
+	for _, f := range snap.Files {
+		if f.Context != "" {
+			files = append(files, f.Path+" ["+f.Context+"]")
+		} else {
+			files = append(files, f.Path)
+		}
+	}
+	return files
+}
+
+// readSessionEvents streams up to limit events from a session-events log left
+// by an older build, stopping as soon as it has them.
+func readSessionEvents(path string, limit int) []sessionEvent {
+	if limit <= 0 {
+		return nil
+	}
+	f, err := os.Open(path)
+	if err != nil {
+		return nil
+	}
+	defer f.Close()
+
+	var events []sessionEvent
+	r := bufio.NewReader(f)
+	for len(events) < limit {
+		line, readErr := r.ReadBytes('\n')
+		if line = bytes.TrimSpace(line); len(line) > 0 {
+			var evt sessionEvent
+			if json.Unmarshal(line, &evt) == nil {
+				events = append(events, evt)
+			}
+		}
+		if readErr != nil {
+			break
 		}
 	}
-	return results
+	return events
 }
 
+// clearFile empties path with a single truncate; a missing file stays missing.
 func clearFile(path string) {
-	_ = os.WriteFile(path, []byte(""), 0o644)
+	_ = os.Truncate(path, 0)
 }
 
 // touchFlag creates a flag file. Returns true if created, false if it already exists.
+// O_EXCL makes the check and the create one atomic step, so concurrent callers
+// cannot both see the flag as missing.
 func touchFlag(path string) bool {
-	if _, err := os.Stat(path); err == nil {
-		return false
+	f, err := os.OpenFile(path, os.O_CREATE|os.O_EXCL|os.O_WRONLY, 0o644)
+	if os.IsNotExist(err) {
+		_ = os.MkdirAll(filepath.Dir(path), 0o755)
+		f, err = os.OpenFile(path, os.O_CREATE|os.O_EXCL|os.O_WRONLY, 0o644)
+	}
+	if err != nil {
+		// Already set — or uncreatable, in which case firing is still preferable
+		// to never firing.
+		return !os.IsExist(err)
 	}
-	_ = os.MkdirAll(filepath.Dir(path), 0o755)
-	_ = os.WriteFile(path, []byte(""), 0o644)
+	f.Close()
 	return true
 }
 
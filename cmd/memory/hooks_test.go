@@ -3,7 +3,10 @@ package main
 import (
 	"os"
 	"path/filepath"
+	"sync"
 	"testing"
+
+	"github.com/mfenderov/mark42/internal/storage"
 )
 
 func TestGetProjectDir(t *testing.T) {
@@ -54,6 +57,17 @@ func TestReadLines(t *testing.T) {
 		}
 	})
 
+	t.Run("returns empty for empty file", func(t *testing.T) {
+		dir := t.TempDir()
+		path := filepath.Join(dir, "test.txt")
+		os.WriteFile(path, nil, 0o644)
+
+		got := readLines(path)
+		if len(got) != 0 {
+			t.Errorf("got %d lines, want 0", len(got))
+		}
+	})
+
 	t.Run("skips blank lines", func(t *testing.T) {
 		dir := t.TempDir()
 		path := filepath.Join(dir, "test.txt")
@@ -66,6 +80,96 @@ func TestReadLines(t *testing.T) {
 	})
 }
 
+func TestDedupDirtyFiles(t *testing.T) {
+	t.Run("deduplicates by path in first-seen order", func(t *testing.T) {
+		got := dedupDirtyFiles([]string{"/a.go", "/b.go", "/a.go"})
+		if len(got) != 2 || got[0] != "/a.go" || got[1] != "/b.go" {
+			t.Errorf("got %v, want [/a.go /b.go]", got)
+		}
+	})
+
+	t.Run("keeps commit context over plain entry", func(t *testing.T) {
+		got := dedupDirtyFiles([]string{"/a.go", "/a.go [abc123: Fix bug]", "/a.go"})
+		if len(got) != 1 || got[0] != "/a.go [abc123: Fix bug]" {
+			t.Errorf("got %v, want [/a.go [abc123: Fix bug]]", got)
+		}
+	})
+}
+
+func TestCollectDirtyFiles(t *testing.T) {
+	dir := t.TempDir()
+	os.WriteFile(filepath.Join(dir, "dirty-files"), []byte("/b.go\n/c.go\n"), 0o644)
+
+	got := collectDirtyFiles(dir, []string{"/a.go", "/b.go"})
+	if len(got) != 3 || got[0] != "/a.go" || got[1] != "/b.go" || got[2] != "/c.go" {
+		t.Errorf("got %v, want [/a.go /b.go /c.go]", got)
+	}
+}
+
+func TestReadSessionEvents(t *testing.T) {
+	t.Run("stops after limit events", func(t *testing.T) {
+		path := filepath.Join(t.TempDir(), "session-events")
+		content := `{"toolName":"Edit","filePath":"/a.go","timestamp":"2026-01-01T00:00:00Z"}
+
+bad json
+{"toolName":"Bash","command":"ls"}
+{"toolName":"Write"}`
+		os.WriteFile(path, []byte(content), 0o644)
+
+		events := readSessionEvents(path, 2)
+		if len(events) != 2 || events[0].ToolName != "Edit" || events[1].ToolName != "Bash" {
+			t.Errorf("events = %+v, want first two valid events", events)
+		}
+		if events[0].FilePath != "/a.go" || events[0].Timestamp == "" {
+			t.Errorf("events[0] = %+v, want filePath and timestamp decoded", events[0])
+		}
+	})
+
+	t.Run("returns empty for missing file", func(t *testing.T) {
+		if events := readSessionEvents("/nonexistent", 50); len(events) != 0 {
+			t.Errorf("got %d events, want 0", len(events))
+		}
+	})
+}
+
+func TestSnapshotHookState(t *testing.T) {
+	t.Run("decodes events and formats commit context", func(t *testing.T) {
+		state := openHookState(t.TempDir(), true)
+		if state == nil {
+			t.Fatal("openHookState returned nil")
+		}
+		defer state.Close()
+
+		state.Record("Edit", `{"filePath":"/a.go"}`, 1, []storage.DirtyFile{{Path: "/a.go"}})
+		state.Record("Bash", `{"command":"git commit"}`, 2, []storage.DirtyFile{{Path: "/b.go", Context: "abc123: Fix bug"}})
+
+		snap := snapshotHookState(state, 1)
+		events := snapshotEvents(snap)
+		if len(events) != 1 || events[0].ToolName != "Edit" || events[0].FilePath != "/a.go" || events[0].TS != 1 {
+			t.Errorf("events = %+v, want first Edit only", events)
+		}
+		files := snapshotFiles(snap)
+		if len(files) != 2 || files[0] != "/a.go" || files[1] != "/b.go [abc123: Fix bug]" {
+			t.Errorf("files = %v, want [/a.go /b.go [abc123: Fix bug]]", files)
+		}
+	})
+
+	t.Run("does not create a missing database", func(t *testing.T) {
+		dir := t.TempDir()
+		if state := openHookState(dir, false); state != nil {
+			state.Close()
+			t.Fatal("expected nil state for missing database")
+		}
+		if _, err := os.Stat(filepath.Join(dir, "state.db")); !os.IsNotExist(err) {
+			t.Error("state.db should not be created by readers")
+		}
+		snap := snapshotHookState(nil, 50)
+		if events, files := snapshotEvents(snap), snapshotFiles(snap); len(events) != 0 || len(files) != 0 {
+			t.Errorf("got %d events, %d files from nil state, want 0", len(events), len(files))
+		}
+	})
+}
+
 func TestTouchFlag(t *testing.T) {
 	t.Run("creates flag file and returns true", func(t *testing.T) {
 		dir := t.TempDir()
@@ -93,6 +197,33 @@ func TestTouchFlag(t *testing.T) {
 	})
 }
 
+func TestTouchFlagConcurrent(t *testing.T) {
+	path := filepath.Join(t.TempDir(), "flag")
+
+	const callers = 16
+	results := make(chan bool, callers)
+	var wg sync.WaitGroup
+	for range callers {
+		wg.Add(1)
+		go func() {
+			defer wg.Done()
+			results <- touchFlag(path)
+		}()
+	}
+	wg.Wait()
+	close(results)
+
+	created := 0
+	for ok := range results {
+		if ok {
+			created++
+		}
+	}
+	if created != 1 {
+		t.Errorf("touchFlag succeeded %d times, want exactly 1", created)
+	}
+}
+
 func TestClearFlag(t *testing.T) {
 	dir := t.TempDir()
 	path := filepath.Join(dir, "flag")
@@ -106,63 +237,29 @@ func TestClearFlag(t *testing.T) {
 }
 
 func TestClearFile(t *testing.T) {
-	dir := t.TempDir()
-	path := filepath.Join(dir, "data.txt")
-	os.WriteFile(path, []byte("content"), 0o644)
-
-	clearFile(path)
-
-	data, err := os.ReadFile(path)
-	if err != nil {
-		t.Fatal(err)
-	}
-	if len(data) != 0 {
-		t.Errorf("file should be empty, got %q", data)
-	}
-}
-
-func TestReadJSONLines(t *testing.T) {
-	type event struct {
-		ToolName string `json:"toolName"`
-		FilePath string `json:"filePath,omitempty"`
-	}
-
-	t.Run("reads valid JSONL", func(t *testing.T) {
+	t.Run("empties existing file", func(t *testing.T) {
 		dir := t.TempDir()
-		path := filepath.Join(dir, "events.jsonl")
-		content := `{"toolName":"Edit","filePath":"/a.go"}
-{"toolName":"Write","filePath":"/b.go"}
-`
-		os.WriteFile(path, []byte(content), 0o644)
+		path := filepath.Join(dir, "data.txt")
+		os.WriteFile(path, []byte("content"), 0o644)
 
-		got := readJSONLines[event](path)
-		if len(got) != 2 {
-			t.Fatalf("got %d events, want 2", len(got))
+		clearFile(path)
+
+		data, err := os.ReadFile(path)
+		if err != nil {
+			t.Fatal(err)
 		}
-		if got[0].ToolName != "Edit" || got[1].ToolName != "Write" {
-			t.Errorf("unexpected events: %+v", got)
+		if len(data) != 0 {
+			t.Errorf("file should be empty, got %q", data)
 		}
 	})
 
-	t.Run("skips bad lines", func(t *testing.T) {
-		dir := t.TempDir()
-		path := filepath.Join(dir, "events.jsonl")
-		content := `{"toolName":"Edit"}
-bad json
-{"toolName":"Write"}
-`
-		os.WriteFile(path, []byte(content), 0o644)
+	t.Run("does not create missing file", func(t *testing.T) {
+		path := filepath.Join(t.TempDir(), "missing.txt")
 
-		got := readJSONLines[event](path)
-		if len(got) != 2 {
-			t.Fatalf("got %d events, want 2 (skip bad)", len(got))
-		}
-	})
+		clearFile(path)
 
-	t.Run("returns empty for missing file", func(t *testing.T) {
-		got := readJSONLines[event]("/nonexistent")
-		if len(got) != 0 {
-			t.Errorf("got %d, want 0", len(got))
+		if _, err := os.Stat(path); !os.IsNotExist(err) {
+			t.Error("missing file should not be created")
 		}
 	})
 }
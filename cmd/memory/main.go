@@ -1752,6 +1752,35 @@ var sessionRecallCmd = &cobra.Command{
 	},
 }
 
+var sessionBootstrapCmd = &cobra.Command{
+	Use:   "bootstrap <project>",
+	Short: "Print all session-start context as JSON",
+	Long: `Print session recall and knowledge graph context for a project as a
+single JSON envelope, so callers get every section with one process launch.
+
+Output format:
+  {"project": "mark42", "recall": "...", "context": "...", "estimatedTokens": 420}`,
+	Args: cobra.ExactArgs(1),
+	RunE: func(cmd *cobra.Command, args []string) error {
+		store, err := getStore()
+		if err != nil {
+			return err
+		}
+		defer store.Close()
+
+		if err := store.Migrate(); err != nil {
+			return err
+		}
+
+		data, err := json.Marshal(buildSessionBootstrap(store, args[0]))
+		if err != nil {
+			return err
+		}
+		output(string(data))
+		return nil
+	},
+}
+
 func init() {
 	sessionListCmd.Flags().String("project", "", "filter by project name")
 	sessionListCmd.Flags().Int("limit", 20, "maximum number of sessions")
@@ -1763,6 +1792,7 @@ func init() {
 	sessionCmd.AddCommand(sessionListCmd)
 	sessionCmd.AddCommand(sessionGetCmd)
 	sessionCmd.AddCommand(sessionRecallCmd)
+	sessionCmd.AddCommand(sessionBootstrapCmd)
 	rootCmd.AddCommand(sessionCmd)
 }
 
@@ -0,0 +1,251 @@
+package main
+
+import (
+	"encoding/json"
+	"errors"
+	"fmt"
+	"net"
+	"os"
+	"os/exec"
+	"path/filepath"
+	"strings"
+	"sync"
+	"syscall"
+	"time"
+
+	"github.com/spf13/cobra"
+
+	"github.com/mfenderov/mark42/internal/storage"
+)
+
+// --- Background worker (Unix socket) ---
+
+const (
+	daemonDialTimeout    = 200 * time.Millisecond
+	daemonRequestTimeout = 5 * time.Second
+)
+
+// daemonRequest is a single query sent to `mark42 serve`, one per connection.
+type daemonRequest struct {
+	Command string `json:"command"`
+	Project string `json:"project,omitempty"`
+	Version string `json:"version"`
+}
+
+type daemonResponse struct {
+	Bootstrap *sessionBootstrap `json:"bootstrap,omitempty"`
+	Error     string            `json:"error,omitempty"`
+}
+
+var serveCmd = &cobra.Command{
+	Use:   "serve",
+	Short: "Run a background worker that answers hook queries over a Unix socket",
+	Long: `Run a long-lived worker that keeps the database open and answers
+hook queries over a Unix socket.
+
+The session-start hook tries the socket first and falls back to opening the
+database itself, starting a worker for later sessions. Each version listens on
+its own socket, so binaries of different versions never share a worker. The
+worker exits after --idle-timeout without requests.
+Set MARK42_NO_DAEMON=1 to keep hooks from using or starting it.`,
+	RunE: func(cmd *cobra.Command, args []string) error {
+		socketPath, _ := cmd.Flags().GetString("socket")
+		if socketPath == "" {
+			socketPath = defaultSocketPath()
+		}
+		idle, _ := cmd.Flags().GetDuration("idle-timeout")
+
+		ln, err := listenDaemon(socketPath)
+		if err != nil {
+			return err
+		}
+		defer ln.Close()
+
+		// Only the worker that won the socket migrates; clients that connect
+		// meanwhile wait in the accept backlog.
+		store, err := getStore()
+		if err != nil {
+			return err
+		}
+		defer store.Close()
+
+		if err := store.Migrate(); err != nil {
+			return err
+		}
+
+		return serveDaemon(ln, store, idle)
+	},
+}
+
+func init() {
+	serveCmd.Flags().String("socket", "", "Unix socket path (default: mark42-<version>.sock next to the database)")
+	serveCmd.Flags().Duration("idle-timeout", 30*time.Minute, "exit after this long without requests (0 disables)")
+
+	rootCmd.AddCommand(serveCmd)
+}
+
+// defaultSocketPath names the socket after Version, so two installed builds
+// (e.g. the plugin's copy and one on PATH) each keep a worker of their own.
+func defaultSocketPath() string {
+	name := "mark42-" + strings.ReplaceAll(Version, string(filepath.Separator), "_") + ".sock"
+	return filepath.Join(filepath.Dir(dbPath), name)
+}
+
+// listenDaemon binds socketPath unless a live worker already holds it. An
+// flock on <socket>.lock makes the liveness check, the removal of a socket
+// left behind by a crash, and the bind one step, so two workers started at
+// the same moment cannot unlink each other's socket.
+func listenDaemon(socketPath string) (net.Listener, error) {
+	lock, err := os.OpenFile(socketPath+".lock", os.O_CREATE|os.O_RDWR, 0o600)
+	if err != nil {
+		return nil, err
+	}
+	defer lock.Close() // releases the flock
+	if err := syscall.Flock(int(lock.Fd()), syscall.LOCK_EX); err != nil {
+		return nil, err
+	}
+
+	if conn, err := net.DialTimeout("unix", socketPath, daemonDialTimeout); err == nil {
+		conn.Close()
+		return nil, fmt.Errorf("worker already listening on %s", socketPath)
+	}
+	_ = os.Remove(socketPath)
+
+	ln, err := net.Listen("unix", socketPath)
+	if err != nil {
+		return nil, err
+	}
+	_ = os.Chmod(socketPath, 0o600)
+	return ln, nil
+}
+
+// serveDaemon accepts connections on ln until it is idle for longer than idle.
+// In-flight requests finish before it returns.
+func serveDaemon(ln net.Listener, store *storage.Store, idle time.Duration) error {
+	done := make(chan struct{})
+	var once sync.Once
+	stop := func() {
+		once.Do(func() {
+			close(done)
+			ln.Close()
+		})
+	}
+
+	activity := make(chan struct{}, 1)
+	if idle > 0 {
+		go func() {
+			timer := time.NewTimer(idle)
+			defer timer.Stop()
+			for {
+				select {
+				case <-activity:
+					timer.Reset(idle)
+				case <-timer.C:
+					stop()
+					return
+				case <-done:
+					return
+				}
+			}
+		}()
+	}
+
+	var wg sync.WaitGroup
+	defer wg.Wait()
+
+	for {
+		conn, err := ln.Accept()
+		if err != nil {
+			select {
+			case <-done:
+				return nil
+			default:
+				stop()
+				return err
+			}
+		}
+
+		select {
+		case activity <- struct{}{}:
+		default:
+		}
+
+		wg.Add(1)
+		go func() {
+			defer wg.Done()
+			handleDaemonConn(conn, store)
+		}()
+	}
+}
+
+func handleDaemonConn(conn net.Conn, store *storage.Store) {
+	defer conn.Close()
+	_ = conn.SetDeadline(time.Now().Add(daemonRequestTimeout))
+
+	var req daemonRequest
+	if err := json.NewDecoder(conn).Decode(&req); err != nil {
+		return
+	}
+	_ = json.NewEncoder(conn).Encode(handleDaemonRequest(store, req))
+}
+
+func handleDaemonRequest(store *storage.Store, req daemonRequest) daemonResponse {
+	// A client from another build (e.g. one given an explicit --socket) may
+	// expect a different schema or output. Refuse it and let it fall back
+	// in-process; the worker keeps serving its own version.
+	if req.Version != Version {
+		return daemonResponse{Error: "version mismatch: worker is " + Version}
+	}
+
+	switch req.Command {
+	case "ping":
+		return daemonResponse{}
+	case "bootstrap":
+		b := buildSessionBootstrap(store, req.Project)
+		return daemonResponse{Bootstrap: &b}
+	default:
+		return daemonResponse{Error: "unknown command: " + req.Command}
+	}
+}
+
+// daemonCall sends req to the worker at socketPath and returns its reply.
+func daemonCall(socketPath string, req daemonRequest) (daemonResponse, error) {
+	conn, err := net.DialTimeout("unix", socketPath, daemonDialTimeout)
+	if err != nil {
+		return daemonResponse{}, err
+	}
+	defer conn.Close()
+	_ = conn.SetDeadline(time.Now().Add(daemonRequestTimeout))
+
+	req.Version = Version
+	if err := json.NewEncoder(conn).Encode(req); err != nil {
+		return daemonResponse{}, err
+	}
+
+	var resp daemonResponse
+	if err := json.NewDecoder(conn).Decode(&resp); err != nil {
+		return daemonResponse{}, err
+	}
+	if resp.Error != "" {
+		return resp, errors.New(resp.Error)
+	}
+	return resp, nil
+}
+
+// startDaemon launches `mark42 serve` in its own session so it outlives the
+// hook process. Errors are ignored: the hook has already answered in-process.
+func startDaemon(socketPath string) {
+	exe, err := os.Executable()
+	if err != nil {
+		return
+	}
+	cmd := exec.Command(exe, "--db", dbPath, "serve", "--socket", socketPath)
+	cmd.SysProcAttr = &syscall.SysProcAttr{Setsid: true}
+	if err := cmd.Start(); err == nil {
+		_ = cmd.Process.Release()
+	}
+}
+
+func daemonDisabled() bool {
+	return os.Getenv("MARK42_NO_DAEMON") != ""
+}
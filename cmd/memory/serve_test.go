@@ -0,0 +1,242 @@
+package main
+
+import (
+	"encoding/json"
+	"net"
+	"os"
+	"path/filepath"
+	"strings"
+	"syscall"
+	"testing"
+	"time"
+
+	"github.com/mfenderov/mark42/internal/storage"
+)
+
+// startTestDaemon serves a fresh store on a Unix socket and returns the socket
+// path, the store, and a channel that receives serveDaemon's result when it
+// exits.
+func startTestDaemon(t *testing.T, idle time.Duration) (string, *storage.Store, <-chan error) {
+	t.Helper()
+
+	// Unix socket paths are length-limited; t.TempDir can be too long on macOS.
+	sockDir, err := os.MkdirTemp("", "m42")
+	if err != nil {
+		t.Fatal(err)
+	}
+	t.Cleanup(func() { os.RemoveAll(sockDir) })
+	socketPath := filepath.Join(sockDir, "s")
+
+	store, err := storage.NewStore(filepath.Join(t.TempDir(), "test.db"))
+	if err != nil {
+		t.Fatal(err)
+	}
+	t.Cleanup(func() { store.Close() })
+	store.Migrate()
+
+	ln, err := net.Listen("unix", socketPath)
+	if err != nil {
+		t.Fatal(err)
+	}
+	t.Cleanup(func() { ln.Close() })
+
+	done := make(chan error, 1)
+	go func() { done <- serveDaemon(ln, store, idle) }()
+	return socketPath, store, done
+}
+
+func TestServeDaemon(t *testing.T) {
+	t.Run("answers bootstrap requests", func(t *testing.T) {
+		socketPath, store, _ := startTestDaemon(t, 0)
+
+		session, _ := store.CreateSession("testproject")
+		store.CompleteSession(session.Name, "Did some testing work")
+
+		resp, err := daemonCall(socketPath, daemonRequest{Command: "bootstrap", Project: "testproject"})
+		if err != nil {
+			t.Fatalf("daemonCall failed: %v", err)
+		}
+		if resp.Bootstrap == nil {
+			t.Fatal("expected bootstrap in response")
+		}
+		if !strings.Contains(resp.Bootstrap.Recall, "Recent Sessions") {
+			t.Errorf("recall missing session header, got: %s", resp.Bootstrap.Recall)
+		}
+	})
+
+	t.Run("rejects unknown commands", func(t *testing.T) {
+		socketPath, _, _ := startTestDaemon(t, 0)
+
+		if _, err := daemonCall(socketPath, daemonRequest{Command: "nope"}); err == nil {
+			t.Error("expected error for unknown command")
+		}
+	})
+
+	t.Run("refuses version mismatch but keeps serving", func(t *testing.T) {
+		socketPath, _, done := startTestDaemon(t, 0)
+
+		conn, err := net.Dial("unix", socketPath)
+		if err != nil {
+			t.Fatal(err)
+		}
+		json.NewEncoder(conn).Encode(daemonRequest{Command: "ping", Version: "other"})
+		var resp daemonResponse
+		json.NewDecoder(conn).Decode(&resp)
+		conn.Close()
+
+		if !strings.Contains(resp.Error, "version mismatch") {
+			t.Errorf("expected version mismatch error, got %q", resp.Error)
+		}
+		if _, err := daemonCall(socketPath, daemonRequest{Command: "ping"}); err != nil {
+			t.Errorf("worker should keep serving its own version: %v", err)
+		}
+		select {
+		case err := <-done:
+			t.Errorf("worker stopped after version mismatch: %v", err)
+		default:
+		}
+	})
+
+	t.Run("exits when idle", func(t *testing.T) {
+		_, _, done := startTestDaemon(t, 50*time.Millisecond)
+
+		select {
+		case err := <-done:
+			if err != nil {
+				t.Errorf("serveDaemon returned %v, want nil", err)
+			}
+		case <-time.After(2 * time.Second):
+			t.Error("worker should exit after idle timeout")
+		}
+	})
+}
+
+func TestListenDaemon(t *testing.T) {
+	newSocketPath := func(t *testing.T) string {
+		dir, err := os.MkdirTemp("", "m42")
+		if err != nil {
+			t.Fatal(err)
+		}
+		t.Cleanup(func() { os.RemoveAll(dir) })
+		return filepath.Join(dir, "s")
+	}
+
+	t.Run("waits for the startup lock", func(t *testing.T) {
+		socketPath := newSocketPath(t)
+		lock, err := os.OpenFile(socketPath+".lock", os.O_CREATE|os.O_RDWR, 0o600)
+		if err != nil {
+			t.Fatal(err)
+		}
+		defer lock.Close()
+		if err := syscall.Flock(int(lock.Fd()), syscall.LOCK_EX); err != nil {
+			t.Fatal(err)
+		}
+
+		result := make(chan error, 1)
+		go func() {
+			ln, err := listenDaemon(socketPath)
+			if err == nil {
+				ln.Close()
+			}
+			result <- err
+		}()
+
+		select {
+		case <-result:
+			t.Fatal("listenDaemon bound the socket while another worker held the lock")
+		case <-time.After(100 * time.Millisecond):
+		}
+
+		syscall.Flock(int(lock.Fd()), syscall.LOCK_UN)
+		select {
+		case err := <-result:
+			if err != nil {
+				t.Errorf("listenDaemon failed after lock release: %v", err)
+			}
+		case <-time.After(2 * time.Second):
+			t.Error("listenDaemon did not proceed after lock release")
+		}
+	})
+
+	t.Run("refuses while a worker is listening", func(t *testing.T) {
+		socketPath := newSocketPath(t)
+
+		ln, err := listenDaemon(socketPath)
+		if err != nil {
+			t.Fatalf("listenDaemon failed: %v", err)
+		}
+		defer ln.Close()
+
+		if second, err := listenDaemon(socketPath); err == nil {
+			second.Close()
+			t.Fatal("second worker should not replace a live one")
+		}
+		conn, err := net.Dial("unix", socketPath)
+		if err != nil {
+			t.Fatalf("live worker's socket was unlinked: %v", err)
+		}
+		conn.Close()
+	})
+
+	t.Run("replaces a stale socket file", func(t *testing.T) {
+		socketPath := newSocketPath(t)
+		os.WriteFile(socketPath, nil, 0o600)
+
+		ln, err := listenDaemon(socketPath)
+		if err != nil {
+			t.Fatalf("listenDaemon failed: %v", err)
+		}
+		ln.Close()
+	})
+}
+
+func TestRunSessionStartFromDaemon(t *testing.T) {
+	t.Run("prints context from worker and clears stop flag", func(t *testing.T) {
+		socketPath, store, _ := startTestDaemon(t, 0)
+		store.CreateEntity("Go Conventions", "convention", []string{"Use gofmt"})
+
+		dir := setupProjectDir(t)
+		flagPath := filepath.Join(mark42Dir(dir), "stop-prompted")
+		os.WriteFile(flagPath, []byte(""), 0o644)
+
+		var buf captureBuffer
+		if !runSessionStartFromDaemon(dir, socketPath, withOutput(&buf)) {
+			t.Fatal("expected worker to answer")
+		}
+		if !strings.Contains(buf.String(), "Relevant Memories") {
+			t.Errorf("output missing context header, got: %s", buf.String())
+		}
+		if _, err := os.Stat(flagPath); !os.IsNotExist(err) {
+			t.Error("stop flag should be cleared")
+		}
+	})
+
+	t.Run("returns false without a worker", func(t *testing.T) {
+		dir := setupProjectDir(t)
+
+		var buf captureBuffer
+		if runSessionStartFromDaemon(dir, filepath.Join(dir, "missing.sock"), withOutput(&buf)) {
+			t.Error("expected fallback when no worker is listening")
+		}
+		if buf.String() != "" {
+			t.Errorf("expected no output, got: %s", buf.String())
+		}
+	})
+}
+
+func TestDefaultSocketPath(t *testing.T) {
+	oldVersion := Version
+	defer func() { Version = oldVersion }()
+
+	Version = "1.2.0"
+	a := defaultSocketPath()
+	Version = "1.3.0"
+	b := defaultSocketPath()
+
+	if a == b {
+		t.Errorf("versions should get separate sockets, both got %s", a)
+	}
+	if filepath.Base(b) != "mark42-1.3.0.sock" {
+		t.Errorf("socket name = %s, want mark42-1.3.0.sock", filepath.Base(b))
+	}
+}
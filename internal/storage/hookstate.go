@@ -0,0 +1,258 @@
+package storage
+
+import (
+	"errors"
+	"fmt"
+	"os"
+
+	"github.com/jmoiron/sqlx"
+	"modernc.org/sqlite"
+	sqlite3 "modernc.org/sqlite/lib"
+)
+
+// HookState is the per-project buffer hooks fill between session boundaries:
+// the tool-call event log and the deduplicated set of dirty files. It is a
+// small WAL database of its own so concurrent hook processes can write
+// without coordinating and readers never re-parse a growing text log.
+type HookState struct {
+	db   *sqlx.DB
+	path string
+}
+
+// HookEvent is one recorded tool call. Data holds the tool-specific details
+// as JSON; the tool name and Unix time are kept in their own columns.
+type HookEvent struct {
+	Tool string `db:"tool"`
+	Data string `db:"data"`
+	TS   int64  `db:"ts"`
+}
+
+// DirtyFile is a tracked file path with optional commit context ("hash: subject").
+type DirtyFile struct {
+	Path    string `db:"path"`
+	Context string `db:"context"`
+}
+
+// HookSnapshot is a consistent read of the hook state. Release deletes
+// exactly what it saw, so rows recorded after the read survive.
+type HookSnapshot struct {
+	Events []HookEvent
+	Files  []DirtyFile
+
+	lastEventID int64
+}
+
+const hookStateSchema = `
+CREATE TABLE IF NOT EXISTS events (
+	id INTEGER PRIMARY KEY,
+	tool TEXT NOT NULL,
+	data TEXT NOT NULL,
+	ts INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS dirty_files (
+	path TEXT PRIMARY KEY,
+	context TEXT NOT NULL DEFAULT '',
+	event_id INTEGER NOT NULL
+);
+`
+
+// hookStateVersion is stored in user_version once the schema exists, so an
+// open of an existing database skips setup after one header read.
+const hookStateVersion = 1
+
+// OpenHookState opens the hook state database at path, creating it if it does
+// not exist. A file that is not a usable database is removed and recreated:
+// it only buffers what hooks recorded since the last stop, and keeping it
+// would make every later hook fail the same way.
+func OpenHookState(path string) (*HookState, error) {
+	db, err := openHookStateDB(path)
+	if isCorrupt(err) {
+		removeHookState(path)
+		db, err = openHookStateDB(path)
+	}
+	if err != nil {
+		return nil, err
+	}
+	return &HookState{db: db, path: path}, nil
+}
+
+func openHookStateDB(path string) (*sqlx.DB, error) {
+	db, err := sqlx.Open("sqlite", path)
+	if err != nil {
+		return nil, fmt.Errorf("failed to open hook state: %w", err)
+	}
+
+	// One connection keeps the per-connection pragmas below in effect.
+	db.SetMaxOpenConns(1)
+
+	// Wait out other hooks holding the write lock instead of failing. In WAL
+	// mode NORMAL fsyncs only at checkpoints, not on every commit.
+	for _, pragma := range []string{"PRAGMA busy_timeout=2000", "PRAGMA synchronous=NORMAL"} {
+		if _, err := db.Exec(pragma); err != nil {
+			db.Close()
+			return nil, fmt.Errorf("failed to configure hook state: %w", err)
+		}
+	}
+
+	var version int
+	if err := db.Get(&version, "PRAGMA user_version"); err != nil {
+		db.Close()
+		return nil, fmt.Errorf("failed to read hook state: %w", err)
+	}
+	if version < hookStateVersion {
+		if err := initHookState(db); err != nil {
+			db.Close()
+			return nil, err
+		}
+	}
+	return db, nil
+}
+
+// initHookState sets up a new database. Every step is idempotent, and the
+// schema is created under BEGIN IMMEDIATE, so hooks that find the database
+// empty at the same moment take turns. SQLite ignores journal_mode changes
+// inside a transaction, so WAL (which persists in the file) is enabled first.
+func initHookState(db *sqlx.DB) error {
+	if _, err := db.Exec("PRAGMA journal_mode=WAL"); err != nil {
+		return fmt.Errorf("failed to enable WAL mode: %w", err)
+	}
+	if _, err := db.Exec("BEGIN IMMEDIATE"); err != nil {
+		return fmt.Errorf("failed to begin transaction: %w", err)
+	}
+	schema := hookStateSchema + fmt.Sprintf("PRAGMA user_version=%d;", hookStateVersion)
+	if _, err := db.Exec(schema); err != nil {
+		_, _ = db.Exec("ROLLBACK")
+		return fmt.Errorf("failed to create hook state schema: %w", err)
+	}
+	if _, err := db.Exec("COMMIT"); err != nil {
+		_, _ = db.Exec("ROLLBACK")
+		return fmt.Errorf("failed to create hook state schema: %w", err)
+	}
+	return nil
+}
+
+// isCorrupt reports whether err means the file is damaged or not a database.
+func isCorrupt(err error) bool {
+	var sqliteErr *sqlite.Error
+	if !errors.As(err, &sqliteErr) {
+		return false
+	}
+	switch sqliteErr.Code() & 0xff {
+	case sqlite3.SQLITE_CORRUPT, sqlite3.SQLITE_NOTADB:
+		return true
+	}
+	return false
+}
+
+// removeHookState deletes the database at path along with its WAL files.
+func removeHookState(path string) {
+	for _, p := range []string{path, path + "-wal", path + "-shm"} {
+		_ = os.Remove(p)
+	}
+}
+
+// Close closes the database connection.
+func (h *HookState) Close() error {
+	return h.db.Close()
+}
+
+// Record stores one tool-call event and marks its files dirty in a single
+// transaction. A file already marked keeps its position; non-empty commit
+// context replaces whatever context it had. If the database turns out to be
+// corrupt, it is recreated and the record retried once.
+func (h *HookState) Record(tool, data string, ts int64, files []DirtyFile) error {
+	err := h.record(tool, data, ts, files)
+	if isCorrupt(err) {
+		if err := h.recreate(); err != nil {
+			return err
+		}
+		err = h.record(tool, data, ts, files)
+	}
+	return err
+}
+
+// recreate replaces a corrupt database with an empty one.
+func (h *HookState) recreate() error {
+	h.db.Close()
+	removeHookState(h.path)
+	db, err := openHookStateDB(h.path)
+	if err != nil {
+		return err
+	}
+	h.db = db
+	return nil
+}
+
+func (h *HookState) record(tool, data string, ts int64, files []DirtyFile) error {
+	tx, err := h.db.Beginx()
+	if err != nil {
+		return fmt.Errorf("failed to begin transaction: %w", err)
+	}
+	defer tx.Rollback()
+
+	res, err := tx.Exec(`INSERT INTO events (tool, data, ts) VALUES (?, ?, ?)`, tool, data, ts)
+	if err != nil {
+		return fmt.Errorf("failed to record event: %w", err)
+	}
+	eventID, err := res.LastInsertId()
+	if err != nil {
+		return fmt.Errorf("failed to record event: %w", err)
+	}
+
+	for _, f := range files {
+		_, err := tx.Exec(`
+			INSERT INTO dirty_files (path, context, event_id) VALUES (?, ?, ?)
+			ON CONFLICT(path) DO UPDATE SET
+				event_id = excluded.event_id,
+				context = CASE WHEN excluded.context != '' THEN excluded.context ELSE context END
+		`, f.Path, f.Context, eventID)
+		if err != nil {
+			return fmt.Errorf("failed to mark dirty file: %w", err)
+		}
+	}
+
+	return tx.Commit()
+}
+
+// Snapshot reads up to limit events, oldest first, and every dirty file in the
+// order it was first marked.
+func (h *HookState) Snapshot(limit int) (*HookSnapshot, error) {
+	tx, err := h.db.Beginx()
+	if err != nil {
+		return nil, fmt.Errorf("failed to begin transaction: %w", err)
+	}
+	defer tx.Rollback()
+
+	s := &HookSnapshot{}
+	if err := tx.Get(&s.lastEventID, `SELECT COALESCE(MAX(id), 0) FROM events`); err != nil {
+		return nil, fmt.Errorf("failed to read events: %w", err)
+	}
+	if limit > 0 {
+		if err := tx.Select(&s.Events, `SELECT tool, data, ts FROM events ORDER BY id LIMIT ?`, limit); err != nil {
+			return nil, fmt.Errorf("failed to read events: %w", err)
+		}
+	}
+	if err := tx.Select(&s.Files, `SELECT path, context FROM dirty_files ORDER BY rowid`); err != nil {
+		return nil, fmt.Errorf("failed to read dirty files: %w", err)
+	}
+	return s, nil
+}
+
+// Release deletes the events and dirty files covered by s. A file marked
+// again after the snapshot was taken points at a newer event and is kept.
+func (h *HookState) Release(s *HookSnapshot) error {
+	tx, err := h.db.Beginx()
+	if err != nil {
+		return fmt.Errorf("failed to begin transaction: %w", err)
+	}
+	defer tx.Rollback()
+
+	if _, err := tx.Exec(`DELETE FROM events WHERE id <= ?`, s.lastEventID); err != nil {
+		return fmt.Errorf("failed to release events: %w", err)
+	}
+	if _, err := tx.Exec(`DELETE FROM dirty_files WHERE event_id <= ?`, s.lastEventID); err != nil {
+		return fmt.Errorf("failed to release dirty files: %w", err)
+	}
+	return tx.Commit()
+}
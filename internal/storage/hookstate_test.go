@@ -0,0 +1,224 @@
+package storage_test
+
+import (
+	"bytes"
+	"os"
+	"path/filepath"
+	"sync"
+	"testing"
+
+	"github.com/mfenderov/mark42/internal/storage"
+)
+
+func newTestHookState(t *testing.T) *storage.HookState {
+	t.Helper()
+	state, err := storage.OpenHookState(filepath.Join(t.TempDir(), "state.db"))
+	if err != nil {
+		t.Fatalf("OpenHookState failed: %v", err)
+	}
+	t.Cleanup(func() { state.Close() })
+	return state
+}
+
+func TestOpenHookState_CreatesWALDatabase(t *testing.T) {
+	path := filepath.Join(t.TempDir(), "state.db")
+
+	state, err := storage.OpenHookState(path)
+	if err != nil {
+		t.Fatalf("OpenHookState failed: %v", err)
+	}
+	if err := state.Record("Edit", `{}`, 1, nil); err != nil {
+		t.Fatalf("Record failed: %v", err)
+	}
+	state.Close()
+
+	// Reopening an existing database skips schema setup but keeps WAL mode.
+	state, err = storage.OpenHookState(path)
+	if err != nil {
+		t.Fatalf("reopen failed: %v", err)
+	}
+	defer state.Close()
+	snap, err := state.Snapshot(10)
+	if err != nil {
+		t.Fatalf("Snapshot failed: %v", err)
+	}
+	if len(snap.Events) != 1 {
+		t.Errorf("got %d events after reopen, want 1", len(snap.Events))
+	}
+
+	header := make([]byte, 20)
+	f, err := os.Open(path)
+	if err != nil {
+		t.Fatal(err)
+	}
+	defer f.Close()
+	f.Read(header)
+	if header[18] != 2 || header[19] != 2 {
+		t.Errorf("database header read/write versions = %d/%d, want WAL (2/2)", header[18], header[19])
+	}
+}
+
+func TestOpenHookState_ConcurrentCreate(t *testing.T) {
+	path := filepath.Join(t.TempDir(), "state.db")
+
+	const hooks = 8
+	errs := make(chan error, hooks)
+	var wg sync.WaitGroup
+	for range hooks {
+		wg.Add(1)
+		go func() {
+			defer wg.Done()
+			state, err := storage.OpenHookState(path)
+			if err != nil {
+				errs <- err
+				return
+			}
+			defer state.Close()
+			errs <- state.Record("Edit", `{}`, 1, nil)
+		}()
+	}
+	wg.Wait()
+	close(errs)
+	for err := range errs {
+		if err != nil {
+			t.Errorf("concurrent open/record failed: %v", err)
+		}
+	}
+
+	state, err := storage.OpenHookState(path)
+	if err != nil {
+		t.Fatalf("OpenHookState failed: %v", err)
+	}
+	defer state.Close()
+	snap, _ := state.Snapshot(100)
+	if len(snap.Events) != hooks {
+		t.Errorf("got %d events, want %d", len(snap.Events), hooks)
+	}
+}
+
+func TestOpenHookState_RecreatesNonDatabase(t *testing.T) {
+	path := filepath.Join(t.TempDir(), "state.db")
+	os.WriteFile(path, bytes.Repeat([]byte("not a database"), 100), 0o644)
+
+	state, err := storage.OpenHookState(path)
+	if err != nil {
+		t.Fatalf("OpenHookState should recreate a non-database file: %v", err)
+	}
+	defer state.Close()
+	if err := state.Record("Edit", `{}`, 1, nil); err != nil {
+		t.Errorf("Record failed after recreate: %v", err)
+	}
+}
+
+func TestHookState_RecordRecreatesCorruptDatabase(t *testing.T) {
+	path := filepath.Join(t.TempDir(), "state.db")
+	state, err := storage.OpenHookState(path)
+	if err != nil {
+		t.Fatalf("OpenHookState failed: %v", err)
+	}
+	state.Record("Edit", `{}`, 1, []storage.DirtyFile{{Path: "/a.go"}})
+	state.Close()
+
+	// Overwrite the events table's page; the header (and user_version) stays
+	// intact, so the damage only shows up when Record touches the table.
+	f, err := os.OpenFile(path, os.O_WRONLY, 0)
+	if err != nil {
+		t.Fatal(err)
+	}
+	f.WriteAt(bytes.Repeat([]byte{0xff}, 4096), 4096)
+	f.Close()
+
+	state, err = storage.OpenHookState(path)
+	if err != nil {
+		t.Fatalf("OpenHookState failed: %v", err)
+	}
+	defer state.Close()
+	if err := state.Record("Write", `{}`, 2, []storage.DirtyFile{{Path: "/b.go"}}); err != nil {
+		t.Fatalf("Record should recover from corruption: %v", err)
+	}
+
+	snap, err := state.Snapshot(10)
+	if err != nil {
+		t.Fatalf("Snapshot failed: %v", err)
+	}
+	if len(snap.Events) != 1 || snap.Events[0].Tool != "Write" || len(snap.Files) != 1 || snap.Files[0].Path != "/b.go" {
+		t.Errorf("got %+v, want only the record made after recovery", snap)
+	}
+}
+
+func TestHookState_RecordDedupesDirtyFiles(t *testing.T) {
+	state := newTestHookState(t)
+
+	state.Record("Edit", `{}`, 1, []storage.DirtyFile{{Path: "/a.go"}, {Path: "/b.go"}})
+	state.Record("Bash", `{}`, 2, []storage.DirtyFile{{Path: "/a.go", Context: "abc123: Fix bug"}})
+	state.Record("Edit", `{}`, 3, []storage.DirtyFile{{Path: "/a.go"}})
+
+	snap, err := state.Snapshot(0)
+	if err != nil {
+		t.Fatalf("Snapshot failed: %v", err)
+	}
+	want := []storage.DirtyFile{{Path: "/a.go", Context: "abc123: Fix bug"}, {Path: "/b.go"}}
+	if len(snap.Files) != len(want) {
+		t.Fatalf("got %v, want %v", snap.Files, want)
+	}
+	for i := range want {
+		if snap.Files[i] != want[i] {
+			t.Errorf("files[%d] = %+v, want %+v", i, snap.Files[i], want[i])
+		}
+	}
+}
+
+func TestHookState_SnapshotEventsInOrder(t *testing.T) {
+	state := newTestHookState(t)
+
+	for i, tool := range []string{"Edit", "Write", "Bash"} {
+		if err := state.Record(tool, `{}`, int64(i+1), nil); err != nil {
+			t.Fatalf("Record failed: %v", err)
+		}
+	}
+
+	snap, err := state.Snapshot(2)
+	if err != nil {
+		t.Fatalf("Snapshot failed: %v", err)
+	}
+	want := []storage.HookEvent{{Tool: "Edit", Data: `{}`, TS: 1}, {Tool: "Write", Data: `{}`, TS: 2}}
+	if len(snap.Events) != 2 || snap.Events[0] != want[0] || snap.Events[1] != want[1] {
+		t.Errorf("got %+v, want %+v", snap.Events, want)
+	}
+}
+
+func TestHookState_ReleaseKeepsLaterRecords(t *testing.T) {
+	state := newTestHookState(t)
+
+	state.Record("Edit", `{}`, 1, []storage.DirtyFile{{Path: "/a.go"}, {Path: "/b.go"}})
+	snap, err := state.Snapshot(1)
+	if err != nil {
+		t.Fatalf("Snapshot failed: %v", err)
+	}
+
+	// A hook that runs between the read and the release.
+	state.Record("Write", `{}`, 2, []storage.DirtyFile{{Path: "/b.go"}, {Path: "/c.go"}})
+
+	if err := state.Release(snap); err != nil {
+		t.Fatalf("Release failed: %v", err)
+	}
+
+	after, err := state.Snapshot(10)
+	if err != nil {
+		t.Fatalf("Snapshot failed: %v", err)
+	}
+	if len(after.Events) != 1 || after.Events[0].Tool != "Write" {
+		t.Errorf("events after release = %+v, want only the later Write", after.Events)
+	}
+	if len(after.Files) != 2 || after.Files[0].Path != "/b.go" || after.Files[1].Path != "/c.go" {
+		t.Errorf("files after release = %+v, want [/b.go /c.go]", after.Files)
+	}
+
+	if err := state.Release(after); err != nil {
+		t.Fatalf("Release failed: %v", err)
+	}
+	empty, _ := state.Snapshot(10)
+	if len(empty.Events) != 0 || len(empty.Files) != 0 {
+		t.Errorf("got %d events, %d files after full release, want 0", len(empty.Events), len(empty.Files))
+	}
+}